@@ -1,24 +1,50 @@
 import os
 import logging
-import traceback
 import json
+import hashlib
+import hmac
 import secrets
 import string
+import threading
 import time
-import glob
 import csv
 import asyncio
+import bisect
+import itertools
+import tempfile
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from aiogram import Bot, Dispatcher, types, F
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, FSInputFile
 from aiogram.filters import Command
-from aiogram.webhook.aiohttp_server import SimpleRequestHandler
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.webhook.aiohttp_server import setup_application
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.methods import AnswerCallbackQuery
+from aiogram.exceptions import TelegramBadRequest
 from aiohttp import web
 
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+    try:
+        import ujson as fallback_json
+    except ImportError:
+        fallback_json = json
+
 # ========== LOGGING SETUP ==========
 logging.basicConfig(
     level=logging.INFO,
@@ -28,7 +54,7 @@ logger = logging.getLogger(__name__)
 
 # ========== CONFIGURATION ==========
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
-ADMIN_IDS = [int(x.strip()) for x in os.getenv("ADMIN_IDS", "").split(",") if x.strip()]
+ADMIN_IDS = frozenset(int(x.strip()) for x in os.getenv("ADMIN_IDS", "").split(",") if x.strip())
 BOT_PASSWORD = os.getenv("BOT_PASSWORD", "default_password")
 
 # Render settings
@@ -36,10 +62,40 @@ WEB_SERVER_HOST = "0.0.0.0"
 WEB_SERVER_PORT = int(os.getenv("PORT", 10000))
 WEBHOOK_PATH = "/webhook"
 BASE_WEBHOOK_URL = os.getenv("RENDER_EXTERNAL_URL", os.getenv("WEBHOOK_URL", ""))
+REDIS_URL = os.getenv("REDIS_URL")  # optional shared FSM storage
 REPORTS_DIR = "reports"
+REPORTS_PREFIX = os.path.join(REPORTS_DIR, "report_")
+CSV_READ_WORKERS = 8  # threads reading report files during CSV export
+ALL_REPORTS_CSV = os.path.join(REPORTS_DIR, "all_reports.csv")
+CSV_HEADER = ('date', 'user_id', 'user_name', 'role', 'checklist', 'task', 'status')
 USER_ASSIGNMENTS_FILE = "user_assignments.json"
 USER_DATA_FILE = "user_data.json"
 NOTIFICATION_SETTINGS_FILE = "notification_settings.json"
+BOT_STATE_FILE = "bot_state.json"  # generated password hash; overrides BOT_PASSWORD
+
+# Password checks run scrypt (~16 MiB, tens of ms each) on their own threads
+PASSWORD_CHECK_WORKERS = 2
+PASSWORD_RETRY_SECONDS = 3  # minimum gap between one user's password attempts
+
+# Outbound Telegram API limits
+TELEGRAM_MAX_CONCURRENCY = 25  # in-flight API requests / connection pool size
+TELEGRAM_KEEPALIVE_SECONDS = 60  # keep idle connections to api.telegram.org warm
+TELEGRAM_MAX_RATE = 25  # messages per second, under Telegram's global limit of 30
+REPORT_SEND_TIMEOUT = 30  # seconds one admin's report send may take, pacing included
+
+# Long user/assignment lists are split into pages of this many entries
+PAGE_SIZE = 8
+
+# Inbound updates acked but not yet processed; past this the webhook waits
+MAX_PENDING_UPDATES = 256
+# Updates processed at the same time, across all chats
+BOT_CONCURRENCY = int(os.getenv("BOT_CONCURRENCY", 64))
+RECENT_UPDATES = 1024  # update IDs remembered for dropping redeliveries
+
+# Sessions idle longer than this are dropped by the background sweeper
+SESSION_TTL_SECONDS = 3600
+SESSION_SWEEP_SECONDS = 300
+MAX_SESSIONS = 10000  # hard cap; the least recently active session is evicted
 
 # Validate required parameters
 if not TELEGRAM_TOKEN:
@@ -49,6 +105,7 @@ if not TELEGRAM_TOKEN:
 # Extract API key from token
 API_KEY = TELEGRAM_TOKEN.split(':')[1]
 SECRET_TOKEN = API_KEY[:32]  # Use first 32 characters of API key
+SECRET_TOKEN_BYTES = SECRET_TOKEN.encode()
 
 # Create reports directory if not exists
 os.makedirs(REPORTS_DIR, exist_ok=True)
@@ -56,11 +113,12 @@ os.makedirs(REPORTS_DIR, exist_ok=True)
 # Diagnostics
 logger.info("===== BOT CONFIGURATION =====")
 logger.info(f"TELEGRAM_TOKEN: {'set' if TELEGRAM_TOKEN else 'NOT SET!'}")
-logger.info(f"ADMIN_IDS: {ADMIN_IDS}")
+logger.info(f"ADMIN_IDS: {sorted(ADMIN_IDS)}")
 logger.info(f"BOT_PASSWORD: {'set' if BOT_PASSWORD else 'NOT SET!'}")
 logger.info(f"BASE_WEBHOOK_URL: {BASE_WEBHOOK_URL or 'NOT SET!'}")
+logger.info(f"FSM storage: {'redis' if REDIS_URL else 'memory'}")
 logger.info(f"Server will run on: {WEB_SERVER_HOST}:{WEB_SERVER_PORT}")
-logger.info(f"SECRET_TOKEN: {SECRET_TOKEN}")
+logger.info(f"SECRET_TOKEN: {'set' if SECRET_TOKEN else 'NOT SET!'}")
 logger.info("=============================")
 
 # ========== ADMIN STATES ==========
@@ -87,13 +145,46 @@ class AdminStates(StatesGroup):
     SET_NOTIFICATION_TIME = State()
     VIEW_STATISTICS = State()
 
+# ========== USER SESSIONS ==========
+@dataclass(slots=True)
+class UserSession:
+    """Progress of a user through the login and checklist flow"""
+    step: str = "name"
+    name: str = None
+    role: str = None
+    checklist: str = None
+    tasks: list = field(default_factory=list)
+    current_task: int = 0
+    results: list = field(default_factory=list)
+    task_message_id: int = None  # message edited in place for each task
+    last_activity: float = field(default_factory=time.monotonic)
+
 # ========== DATA MANAGEMENT ==========
+# Use the fastest available JSON codec; both helpers work on bytes
+if orjson is not None:
+    def json_loads(data):
+        return orjson.loads(data)
+
+    def json_dumps(obj, indent=False):
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+else:
+    # ujson is compact already; the stdlib needs explicit separators
+    compact_separators = {"separators": (",", ":")} if fallback_json is json else {}
+
+    def json_loads(data):
+        return fallback_json.loads(data)
+
+    def json_dumps(obj, indent=False):
+        if indent:
+            return fallback_json.dumps(obj, indent=2, ensure_ascii=False).encode()
+        return fallback_json.dumps(obj, ensure_ascii=False, **compact_separators).encode()
+
 def load_checklists():
     """Load checklists from file or use default"""
     try:
-        with open('checklists.json', 'r') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
+        with open('checklists.json', 'rb') as f:
+            return json_loads(f.read())
+    except (FileNotFoundError, ValueError):
         return {
             "Bartender": {
                 "Opening Shift": [
@@ -158,118 +249,405 @@ def load_checklists():
         }
 
 def save_checklists():
-    """Save checklists to file"""
-    with open('checklists.json', 'w') as f:
-        json.dump(checklists, f, indent=2)
-    logger.info("Checklists saved to file")
+    """Schedule checklists to be saved to file"""
+    checklists_dirty.set()
 
 def load_user_assignments():
     """Load user assignments from file"""
     try:
-        with open(USER_ASSIGNMENTS_FILE, 'r') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
+        with open(USER_ASSIGNMENTS_FILE, 'rb') as f:
+            data = json_loads(f.read())
+        # JSON forces string keys; keep user IDs as ints in memory
+        return {int(uid): assignment for uid, assignment in data.items()}
+    except (FileNotFoundError, ValueError):
         return {}
 
 def save_user_assignments():
-    """Save user assignments to file"""
-    with open(USER_ASSIGNMENTS_FILE, 'w') as f:
-        json.dump(user_assignments, f, indent=2)
-    logger.info("User assignments saved to file")
+    """Schedule user assignments to be saved to file"""
+    user_assignments_dirty.set()
 
 def load_user_data():
     """Load user data from file"""
     try:
-        with open(USER_DATA_FILE, 'r') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
+        with open(USER_DATA_FILE, 'rb') as f:
+            return json_loads(f.read())
+    except (FileNotFoundError, ValueError):
         return {}
 
 def save_user_data():
-    """Save user data to file"""
-    with open(USER_DATA_FILE, 'w') as f:
-        json.dump(user_data, f, indent=2)
-    logger.info("User data saved to file")
+    """Schedule user data to be saved to file"""
+    user_data_dirty.set()
 
 def load_notification_settings():
     """Load notification settings from file"""
     try:
-        with open(NOTIFICATION_SETTINGS_FILE, 'r') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
+        with open(NOTIFICATION_SETTINGS_FILE, 'rb') as f:
+            return json_loads(f.read())
+    except (FileNotFoundError, ValueError):
         return {"enabled": False, "reminder_time": "09:00", "users": {}}
 
 def save_notification_settings():
-    """Save notification settings to file"""
-    with open(NOTIFICATION_SETTINGS_FILE, 'w') as f:
-        json.dump(notification_settings, f, indent=2)
-    logger.info("Notification settings saved to file")
+    """Schedule notification settings to be saved to file"""
+    notification_settings_dirty.set()
+
+def hash_password(password, salt=None):
+    """Derive an scrypt hash of a password, returns hex (salt, hash)"""
+    salt = bytes.fromhex(salt) if salt else secrets.token_bytes(16)
+    digest = hashlib.scrypt(password.encode(), salt=salt, n=2**14, r=8, p=1)
+    return salt.hex(), digest.hex()
+
+def check_password(password, salt, password_hash):
+    """Constant-time check of a password against a stored salt and hash"""
+    _, digest = hash_password(password, salt)
+    return hmac.compare_digest(digest, password_hash)
+
+# Separate pool so password spam can't starve the default executor that
+# report saving, CSV export and statistics run on
+password_executor = ThreadPoolExecutor(max_workers=PASSWORD_CHECK_WORKERS, thread_name_prefix="password")
+password_attempts = {}  # user_id -> monotonic time of last password attempt
+
+def load_bot_state():
+    """Load bot state from file, hashing BOT_PASSWORD if none was generated"""
+    try:
+        with open(BOT_STATE_FILE, 'rb') as f:
+            return json_loads(f.read())
+    except (FileNotFoundError, ValueError):
+        salt, digest = hash_password(BOT_PASSWORD)
+        return {"password_salt": salt, "password_hash": digest}
+
+def save_bot_state():
+    """Schedule bot state to be saved to file"""
+    bot_state_dirty.set()
 
 # Load initial data
 checklists = load_checklists()
 user_assignments = load_user_assignments()
 user_data = load_user_data()
 notification_settings = load_notification_settings()
+bot_state = load_bot_state()
+
+# ========== BACKGROUND PERSISTENCE ==========
+# Frequently edited files are written by background writers: save_*() only
+# flags them dirty, and a burst of edits collapses into one atomic write.
+SAVE_DEBOUNCE_SECONDS = 0.5
+
+checklists_dirty = asyncio.Event()
+user_assignments_dirty = asyncio.Event()
+user_data_dirty = asyncio.Event()
+notification_settings_dirty = asyncio.Event()
+bot_state_dirty = asyncio.Event()
+
+# (dirty flag, path, serializer) for every debounced file
+DEBOUNCED_FILES = (
+    (checklists_dirty, 'checklists.json', lambda: json_dumps(checklists)),
+    (user_assignments_dirty, USER_ASSIGNMENTS_FILE,
+     lambda: json_dumps({str(uid): a for uid, a in user_assignments.items()}, indent=True)),
+    (user_data_dirty, USER_DATA_FILE, lambda: json_dumps(user_data, indent=True)),
+    (notification_settings_dirty, NOTIFICATION_SETTINGS_FILE, lambda: json_dumps(notification_settings, indent=True)),
+    (bot_state_dirty, BOT_STATE_FILE, lambda: json_dumps(bot_state, indent=True)),
+)
+
+background_tasks = set()
+
+# The shutdown flush can overlap a writer thread still saving the same file;
+# snapshots are numbered so an older one never replaces a newer one
+save_seq = itertools.count()
+saved_seq = {}  # path -> number of the snapshot on disk
+save_locks = {path: threading.Lock() for _, path, _ in DEBOUNCED_FILES}
+
+def write_file_atomic(path, payload):
+    """Write bytes to a unique temp file and swap it into place"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=f"{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def write_snapshot(path, seq, payload):
+    """Write a debounced file's snapshot unless a newer one is already on disk"""
+    with save_locks[path]:
+        if saved_seq.get(path, -1) > seq:
+            return
+        write_file_atomic(path, payload)
+        saved_seq[path] = seq
+
+async def debounced_writer(dirty, path, serialize):
+    """Write a file whenever it is flagged dirty, at most once per debounce window"""
+    while True:
+        await dirty.wait()
+        await asyncio.sleep(SAVE_DEBOUNCE_SECONDS)
+        dirty.clear()
+        try:
+            # Serialize on the event loop so handlers can't mutate the data mid-dump
+            seq, payload = next(save_seq), serialize()
+            await asyncio.to_thread(write_snapshot, path, seq, payload)
+            logger.info(f"Saved {path}")
+        except Exception:
+            logger.exception(f"Error saving {path}")
+            dirty.set()
+
+def start_debounced_writers():
+    """Start one background writer per debounced file"""
+    for dirty, path, serialize in DEBOUNCED_FILES:
+        task = asyncio.create_task(debounced_writer(dirty, path, serialize))
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
+
+def flush_debounced_files():
+    """Synchronously write any files with pending changes"""
+    for dirty, path, serialize in DEBOUNCED_FILES:
+        if dirty.is_set():
+            write_snapshot(path, next(save_seq), serialize())
+            dirty.clear()
+            logger.info(f"Saved {path}")
+
+# ========== CHECKLIST INDEX ==========
+# Callback data refers to roles and checklists by small integer IDs instead of
+# their names, which keeps payloads short and safe for names containing ':'.
+role_names = []         # role_id -> role name
+role_ids = {}           # role name -> role_id
+checklist_refs = {}     # cl_id -> (role name, checklist name)
+checklist_ids = {}      # (role_id, checklist name) -> cl_id
+checklist_id_counter = itertools.count()
+
+def index_checklists():
+    """Assign IDs to new roles/checklists and drop IDs of removed ones"""
+    current = set()
+    for role, role_checklists in checklists.items():
+        if role not in role_ids:
+            role_ids[role] = len(role_names)
+            role_names.append(role)
+        role_id = role_ids[role]
+        for cl_name in role_checklists:
+            key = (role_id, cl_name)
+            current.add(key)
+            if key not in checklist_ids:
+                cl_id = next(checklist_id_counter)
+                checklist_ids[key] = cl_id
+                checklist_refs[cl_id] = (role, cl_name)
+
+    for key in list(checklist_ids):
+        if key not in current:
+            del checklist_refs[checklist_ids.pop(key)]
+
+def get_checklist_id(role, cl_name):
+    """Get the callback ID of a checklist"""
+    return checklist_ids[(role_ids[role], cl_name)]
+
+def get_role_by_id(role_id):
+    """Resolve a role ID from callback data, None if unknown"""
+    if 0 <= role_id < len(role_names) and role_names[role_id] in checklists:
+        return role_names[role_id]
+    return None
+
+@contextmanager
+def editing_checklists():
+    """Single write path for checklists: yields the data, then reindexes and saves it"""
+    yield checklists
+    index_checklists()
+    keyboard_cache.clear()
+    save_checklists()
+
+index_checklists()
+
+# ========== ASSIGNMENT INDEX ==========
+# Users assigned to each checklist, so renaming or deleting a checklist
+# finds its assignees without scanning every assignment. All writes to
+# user_assignments go through the functions below to keep it in sync.
+assignments_by_checklist = {}  # (role name, checklist name) -> set of user IDs
+
+def index_assignments():
+    """Rebuild the checklist -> users index from user_assignments"""
+    assignments_by_checklist.clear()
+    for uid, assignment in user_assignments.items():
+        key = (assignment["role"], assignment["checklist"])
+        assignments_by_checklist.setdefault(key, set()).add(uid)
+
+def assign_checklist(user_id, role, cl_name):
+    """Assign a checklist to a user, replacing any previous assignment"""
+    unassign_user(user_id)
+    user_assignments[user_id] = {"role": role, "checklist": cl_name}
+    assignments_by_checklist.setdefault((role, cl_name), set()).add(user_id)
+    save_user_assignments()
+
+def unassign_user(user_id):
+    """Remove a user's assignment and return it, None if there was none"""
+    assignment = user_assignments.pop(user_id, None)
+    if assignment:
+        key = (assignment["role"], assignment["checklist"])
+        uids = assignments_by_checklist[key]
+        uids.discard(user_id)
+        if not uids:
+            del assignments_by_checklist[key]
+        save_user_assignments()
+    return assignment
+
+def rename_checklist_assignments(role, old_name, new_name):
+    """Point assignments of a renamed checklist at its new name"""
+    uids = assignments_by_checklist.pop((role, old_name), None)
+    if uids:
+        for uid in uids:
+            user_assignments[uid]["checklist"] = new_name
+        assignments_by_checklist.setdefault((role, new_name), set()).update(uids)
+        save_user_assignments()
+
+def drop_checklist_assignments(role, cl_name):
+    """Remove all assignments of a deleted checklist"""
+    uids = assignments_by_checklist.pop((role, cl_name), None)
+    if uids:
+        for uid in uids:
+            del user_assignments[uid]
+        save_user_assignments()
+
+index_assignments()
 
 # ========== BOT STATE ==========
-user_sessions = {}
-storage = MemoryStorage()
+# (mtime, path) of every report, oldest first; kept in sync by save_report()
+# and clear_reports() so listing reports needs no directory scan
+reports_index = []
+# Rendered role/checklist/task keyboards; cleared whenever checklists change
+keyboard_cache = {}
+# path -> (mtime_ns, size, summary) for reports shown by view_reports
+report_summaries = {}
+# Serializes appends to, rebuilds and deletion of ALL_REPORTS_CSV across threads
+csv_lock = threading.Lock()
+user_sessions = OrderedDict()  # user_id -> UserSession, least recently active first
+if REDIS_URL:
+    # Requires the `redis` package; keeps admin FSM state across restarts/workers
+    from aiogram.fsm.storage.redis import RedisStorage
+    storage = RedisStorage.from_url(REDIS_URL)
+else:
+    storage = MemoryStorage()
 
 # ========== HELPER FUNCTIONS ==========
+PASSWORD_ALPHABET = string.ascii_letters + string.digits + "!@#$%^&*"
+
 def generate_password(length=10):
     """Generate a secure random password"""
-    alphabet = string.ascii_letters + string.digits + "!@#$%^&*"
-    return ''.join(secrets.choice(alphabet) for _ in range(length))
+    n = len(PASSWORD_ALPHABET)
+    limit = 256 - 256 % n  # bytes at or above this would bias the modulo
+    chars = []
+    while len(chars) < length:
+        # One CSPRNG draw normally covers the whole password
+        chars.extend(PASSWORD_ALPHABET[b % n] for b in secrets.token_bytes(length * 2) if b < limit)
+    return ''.join(chars[:length])
 
 def is_admin(user_id):
     """Check if user is admin"""
-    return user_id in ADMIN_IDS or (str(user_id) in user_data and user_data[str(user_id)].get("is_admin", False))
+    if user_id in ADMIN_IDS:
+        return True
+    info = user_data.get(str(user_id))
+    return bool(info and info.get("is_admin", False))
+
+def start_session(user_id):
+    """Create a user session, evicting the least recently active one at capacity"""
+    if user_id not in user_sessions and len(user_sessions) >= MAX_SESSIONS:
+        oldest, _ = user_sessions.popitem(last=False)
+        logger.warning(f"Session limit reached, evicted session of user {oldest}")
+    user_sessions[user_id] = UserSession()
+    user_sessions.move_to_end(user_id)
+
+def touch_session(user_id, session):
+    """Record activity on a session, keeping user_sessions in activity order"""
+    session.last_activity = time.monotonic()
+    user_sessions.move_to_end(user_id)
 
 def get_user_name(user_id):
     """Get user name from sessions or assignments"""
-    if user_id in user_sessions:
-        return user_sessions[user_id].get("name", f"User {user_id}")
-    if str(user_id) in user_data:
-        return user_data[str(user_id)].get("name", f"User {user_id}")
+    session = user_sessions.get(user_id)
+    if session and session.name:
+        return session.name
+    if session is None:
+        info = user_data.get(str(user_id))
+        if info and "name" in info:
+            return info["name"]
     return f"User {user_id}"
 
+def paginate(items, page, page_callback):
+    """Slice items to one page and build the ⬅️/➡️ navigation row"""
+    last_page = max(0, (len(items) - 1) // PAGE_SIZE)
+    page = min(max(page, 0), last_page)
+    
+    nav = []
+    if page > 0:
+        nav.append(InlineKeyboardButton(text="⬅️", callback_data=f"{page_callback}:{page - 1}"))
+    if page < last_page:
+        nav.append(InlineKeyboardButton(text="➡️", callback_data=f"{page_callback}:{page + 1}"))
+    return items[page * PAGE_SIZE:(page + 1) * PAGE_SIZE], nav
+
 def checklist_keyboard(role):
     """Create checklist selection keyboard"""
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[])
-    for cl_name in checklists[role].keys():
-        keyboard.inline_keyboard.append([
-            InlineKeyboardButton(text=cl_name, callback_data=f"cl:{cl_name}"),
-            InlineKeyboardButton(text="🗑️", callback_data=f"delete_cl:{cl_name}")
+    cache_key = ("checklists", role)
+    if cache_key in keyboard_cache:
+        return keyboard_cache[cache_key]
+    
+    rows = []
+    for cl_name in checklists[role]:
+        cl_id = get_checklist_id(role, cl_name)
+        rows.append([
+            InlineKeyboardButton(text=cl_name, callback_data=f"cl:{cl_id}"),
+            InlineKeyboardButton(text="🗑️", callback_data=f"delete_cl:{cl_id}")
         ])
-    keyboard.inline_keyboard.append([
-        InlineKeyboardButton(text="➕ Add New Checklist", callback_data="add_checklist")
-    ])
-    keyboard.inline_keyboard.append([
-        InlineKeyboardButton(text="⬅️ Back to Roles", callback_data="back_to_roles")
+    rows.extend([
+        [InlineKeyboardButton(text="➕ Add New Checklist", callback_data="add_checklist")],
+        [InlineKeyboardButton(text="⬅️ Back to Roles", callback_data="back_to_roles")]
     ])
+    keyboard = InlineKeyboardMarkup(inline_keyboard=rows)
+    keyboard_cache[cache_key] = keyboard
     return keyboard
 
-def tasks_keyboard(tasks):
+# Rows shared by every tasks keyboard
+TASKS_KB_FOOTER = (
+    [InlineKeyboardButton(text="✅ Add New Task", callback_data="add_task")],
+    [InlineKeyboardButton(text="📝 Rename Checklist", callback_data="rename_checklist")],
+    [InlineKeyboardButton(text="⬅️ Back to Checklists", callback_data="back_to_checklists")]
+)
+
+def tasks_keyboard(cl_id, tasks):
     """Create tasks management keyboard"""
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[])
-    
-    for i, task in enumerate(tasks):
-        keyboard.inline_keyboard.append([
-            InlineKeyboardButton(text=f"✏️ {i+1}. {task[:20]}...", callback_data=f"edit_task:{i}"),
-            InlineKeyboardButton(text="🗑️", callback_data=f"delete_task:{i}")
-        ])
+    cache_key = ("tasks", cl_id)
+    if cache_key in keyboard_cache:
+        return keyboard_cache[cache_key]
     
-    keyboard.inline_keyboard.append([
-        InlineKeyboardButton(text="✅ Add New Task", callback_data="add_task")
-    ])
-    keyboard.inline_keyboard.append([
-        InlineKeyboardButton(text="📝 Rename Checklist", callback_data="rename_checklist")
-    ])
-    keyboard.inline_keyboard.append([
-        InlineKeyboardButton(text="⬅️ Back to Checklists", callback_data="back_to_checklists")
-    ])
+    rows = [
+        [
+            InlineKeyboardButton(text=f"✏️ {i+1}. {task[:20]}...", callback_data=f"edit_task:{cl_id}:{i}"),
+            InlineKeyboardButton(text="🗑️", callback_data=f"delete_task:{cl_id}:{i}")
+        ]
+        for i, task in enumerate(tasks)
+    ]
+    rows.extend(TASKS_KB_FOOTER)
+    keyboard = InlineKeyboardMarkup(inline_keyboard=rows)
+    keyboard_cache[cache_key] = keyboard
     return keyboard
 
+def roles_keyboard():
+    """Create role selection keyboard for checklist editing"""
+    cache_key = ("roles",)
+    if cache_key not in keyboard_cache:
+        rows = [
+            [InlineKeyboardButton(text=role, callback_data=f"admin_role:{role_ids[role]}")]
+            for role in checklists
+        ]
+        rows.append([InlineKeyboardButton(text="⬅️ Cancel", callback_data="admin_cancel")])
+        keyboard_cache[cache_key] = InlineKeyboardMarkup(inline_keyboard=rows)
+    return keyboard_cache[cache_key]
+
+def assign_roles_keyboard():
+    """Create role selection keyboard for assignments"""
+    cache_key = ("assign_roles",)
+    if cache_key not in keyboard_cache:
+        rows = [
+            [InlineKeyboardButton(text=role, callback_data=f"assign_role:{role_ids[role]}")]
+            for role in checklists
+        ]
+        rows.append([InlineKeyboardButton(text="⬅️ Back", callback_data="assign_user")])
+        keyboard_cache[cache_key] = InlineKeyboardMarkup(inline_keyboard=rows)
+    return keyboard_cache[cache_key]
+
 def reports_keyboard():
     """Create reports management keyboard"""
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
@@ -322,14 +700,25 @@ def statistics_keyboard():
     ])
     return keyboard
 
+# Static menus, built once
+REPORTS_KB = reports_keyboard()
+ASSIGNMENTS_KB = assignments_keyboard()
+USERS_KB = users_management_keyboard()
+NOTIFICATIONS_KB = notifications_keyboard()
+STATISTICS_KB = statistics_keyboard()
+TASK_KB = InlineKeyboardMarkup(inline_keyboard=[[
+    InlineKeyboardButton(text="✅ Done", callback_data="task:Done"),
+    InlineKeyboardButton(text="❌ Not Done", callback_data="task:Not Done")
+]])
+
 def save_report(user_id, user_name, role, cl_name, results):
     """Save report to file"""
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"{REPORTS_DIR}/report_{timestamp}_{user_id}.json"
+    now = datetime.now()
+    filename = f"{REPORTS_PREFIX}{now:%Y%m%d_%H%M%S}_{user_id}.json"
     
     report_data = {
-        "timestamp": time.time(),
-        "date": datetime.now().isoformat(),
+        "timestamp": now.timestamp(),
+        "date": now.isoformat(),
         "user_id": user_id,
         "user_name": user_name,
         "role": role,
@@ -337,66 +726,140 @@ def save_report(user_id, user_name, role, cl_name, results):
         "results": results
     }
     
-    with open(filename, 'w') as f:
-        json.dump(report_data, f, indent=2)
+    write_file_atomic(filename, json_dumps(report_data))
+    # Reports can be saved from several worker threads. Index and append
+    # under one lock so a CSV rebuild sees the report either in both the
+    # index and the file or in neither, never writing its rows twice
+    with csv_lock:
+        bisect.insort(reports_index, (report_data["timestamp"], filename))
+        append_csv_rows(report_rows(report_data))
     
     logger.info(f"Report saved: {filename}")
     return filename
 
+def load_report_summary(report_file):
+    """Render the view_reports entry for one report, cached per file version"""
+    st = os.stat(report_file)
+    cached = report_summaries.get(report_file)
+    if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+        return cached[2]
+    
+    with open(report_file, 'rb') as f:
+        report = json_loads(f.read())
+    done_count = sum(1 for _, status in report['results'] if status == 'Done')
+    not_done_count = len(report['results']) - done_count
+    
+    summary = (
+        f"{report['date']}\n"
+        f"👤 {report['user_name']} (ID: {report['user_id']})\n"
+        f"🏷️ Role: {report['role']} - {report['checklist']}\n"
+        f"✅ Done: {done_count}\n"
+        f"❌ Not Done: {not_done_count}\n\n"
+    )
+    report_summaries[report_file] = (st.st_mtime_ns, st.st_size, summary)
+    return summary
+
+def scan_reports():
+    """List report file entries in the reports directory"""
+    return [
+        entry for entry in os.scandir(REPORTS_DIR)
+        if entry.name.startswith("report_") and entry.name.endswith(".json")
+    ]
+
+def load_reports_index():
+    """Rebuild the report index from the reports directory"""
+    entries = [(entry.stat().st_mtime, entry.path) for entry in scan_reports()]
+    entries.sort()
+    reports_index[:] = entries
+
 def get_reports(limit=10):
     """Get list of reports sorted by date"""
-    report_files = glob.glob(f"{REPORTS_DIR}/report_*.json")
-    report_files.sort(key=os.path.getmtime, reverse=True)
-    return report_files[:limit]
+    return [path for _, path in reversed(reports_index[-limit:])]
+
+def render_reports_list(reports):
+    """Render the view_reports listing; reads uncached reports from disk"""
+    parts = [f"📋 Last {len(reports)} Reports:\n\n"]
+    for i, report_file in enumerate(reports, 1):
+        try:
+            parts.append(f"{i}. {load_report_summary(report_file)}")
+        except Exception as e:
+            logger.error(f"Error reading report {report_file}: {e}")
+            parts.append(f"{i}. Error reading report\n\n")
+    return "".join(parts)
+
+def report_rows(report):
+    """Render the CSV rows of one report"""
+    date, user_id, user_name = report['date'], report['user_id'], report['user_name']
+    role, checklist = report['role'], report['checklist']
+    return [(date, user_id, user_name, role, checklist, task, status) for task, status in report['results']]
+
+def load_report_rows(report_file):
+    """Read one report and render its CSV rows"""
+    try:
+        with open(report_file, 'rb') as f:
+            return report_rows(json_loads(f.read()))
+    except Exception as e:
+        logger.error(f"Error processing report {report_file}: {e}")
+        return []
+
+def append_csv_rows(rows):
+    """Add a new report's rows to the CSV export, if it has been built; caller holds csv_lock"""
+    if os.path.exists(ALL_REPORTS_CSV):
+        with open(ALL_REPORTS_CSV, 'a', newline='', encoding='utf-8') as csvfile:
+            csv.writer(csvfile).writerows(rows)
 
 def generate_csv_report():
-    """Generate CSV file with all reports"""
-    csv_filename = f"{REPORTS_DIR}/all_reports_{int(time.time())}.csv"
-    report_files = glob.glob(f"{REPORTS_DIR}/report_*.json")
-    
-    with open(csv_filename, 'w', newline='', encoding='utf-8') as csvfile:
-        fieldnames = ['date', 'user_id', 'user_name', 'role', 'checklist', 'task', 'status']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        
-        for report_file in report_files:
-            try:
-                with open(report_file, 'r') as f:
-                    report = json.load(f)
-                    for task, status in report['results']:
-                        writer.writerow({
-                            'date': report['date'],
-                            'user_id': report['user_id'],
-                            'user_name': report['user_name'],
-                            'role': report['role'],
-                            'checklist': report['checklist'],
-                            'task': task,
-                            'status': status
-                        })
-            except Exception as e:
-                logger.error(f"Error processing report {report_file}: {e}")
+    """Get the CSV file with all reports, rebuilding it only when missing or stale"""
+    with csv_lock:
+        try:
+            csv_mtime = os.stat(ALL_REPORTS_CSV).st_mtime
+        except FileNotFoundError:
+            csv_mtime = None
+        # save_report() appends to the CSV, so it only falls behind if an
+        # append failed or reports were added outside the bot
+        if csv_mtime is not None and (not reports_index or csv_mtime >= reports_index[-1][0]):
+            return ALL_REPORTS_CSV
+        
+        report_files = [path for _, path in reports_index]
+        tmp_filename = f"{ALL_REPORTS_CSV}.tmp"
+        with open(tmp_filename, 'w', newline='', encoding='utf-8') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(CSV_HEADER)
+            
+            # Overlap report reads across threads; map() keeps the file order
+            with ThreadPoolExecutor(max_workers=CSV_READ_WORKERS) as executor:
+                for rows in executor.map(load_report_rows, report_files):
+                    writer.writerows(rows)
+        os.replace(tmp_filename, ALL_REPORTS_CSV)
     
-    return csv_filename
+    return ALL_REPORTS_CSV
 
 def clear_reports():
     """Clear all reports"""
-    report_files = glob.glob(f"{REPORTS_DIR}/report_*.json")
+    report_files = [entry.path for entry in scan_reports()]
     for file in report_files:
         try:
             os.remove(file)
         except Exception as e:
             logger.error(f"Error deleting report {file}: {e}")
+    report_summaries.clear()
+    with csv_lock:
+        try:
+            os.remove(ALL_REPORTS_CSV)
+        except FileNotFoundError:
+            pass
+    load_reports_index()
     return len(report_files)
 
 def get_user_activity_stats():
     """Get user activity statistics"""
-    reports = glob.glob(f"{REPORTS_DIR}/report_*.json")
+    reports = [entry.path for entry in scan_reports()]
     user_stats = {}
     
     for report_file in reports:
         try:
-            with open(report_file, 'r') as f:
-                report = json.load(f)
+            with open(report_file, 'rb') as f:
+                report = json_loads(f.read())
                 user_id = report['user_id']
                 
                 if user_id not in user_stats:
@@ -423,7 +886,7 @@ def get_user_activity_stats():
 
 def get_completion_stats():
     """Get completion statistics"""
-    reports = glob.glob(f"{REPORTS_DIR}/report_*.json")
+    reports = [entry.path for entry in scan_reports()]
     completion_stats = {
         'total_checklists': 0,
         'completed_checklists': 0,
@@ -435,24 +898,29 @@ def get_completion_stats():
     
     for report_file in reports:
         try:
-            with open(report_file, 'r') as f:
-                report = json.load(f)
+            with open(report_file, 'rb') as f:
+                report = json_loads(f.read())
                 role = report['role']
                 checklist = report['checklist']
                 
+                # One pass over the results gives both counts
+                total_tasks = len(report['results'])
+                done_tasks = sum(1 for _, status in report['results'] if status == 'Done')
+                fully_done = done_tasks == total_tasks
+                
                 completion_stats['total_checklists'] += 1
-                completion_stats['total_tasks'] += len(report['results'])
-                completion_stats['completed_tasks'] += sum(1 for _, status in report['results'] if status == 'Done')
+                completion_stats['total_tasks'] += total_tasks
+                completion_stats['completed_tasks'] += done_tasks
                 
                 # Check if checklist is fully completed
-                if all(status == 'Done' for _, status in report['results']):
+                if fully_done:
                     completion_stats['completed_checklists'] += 1
                 
                 # Update role stats
                 if role not in completion_stats['by_role']:
                     completion_stats['by_role'][role] = {'total': 0, 'completed': 0}
                 completion_stats['by_role'][role]['total'] += 1
-                if all(status == 'Done' for _, status in report['results']):
+                if fully_done:
                     completion_stats['by_role'][role]['completed'] += 1
                 
                 # Update checklist stats
@@ -460,7 +928,7 @@ def get_completion_stats():
                 if checklist_key not in completion_stats['by_checklist']:
                     completion_stats['by_checklist'][checklist_key] = {'total': 0, 'completed': 0}
                 completion_stats['by_checklist'][checklist_key]['total'] += 1
-                if all(status == 'Done' for _, status in report['results']):
+                if fully_done:
                     completion_stats['by_checklist'][checklist_key]['completed'] += 1
                     
         except Exception as e:
@@ -485,7 +953,7 @@ async def send_notifications(bot: Bot):
         if user_id not in user_assignments:
             continue
         
-        assignment = user_assignments[str(user_id)]
+        assignment = user_assignments[user_id]
         role = assignment["role"]
         cl_name = assignment["checklist"]
         
@@ -509,8 +977,7 @@ async def start_handler(message: types.Message):
         
         # Reset session on each /start
         user_id = message.from_user.id
-        if user_id in user_sessions:
-            del user_sessions[user_id]
+        user_sessions.pop(user_id, None)
             
         # Admin specific commands
         if is_admin(user_id):
@@ -529,19 +996,19 @@ async def start_handler(message: types.Message):
             )
         else:
             await message.answer("🚀 Welcome to La Croisette Checklist Bot!\nPlease enter the password:")
-    except Exception as e:
-        logger.error(f"Error in start_handler: {e}\n{traceback.format_exc()}")
+    except Exception:
+        logger.exception("Error in start_handler")
         await message.answer("❌ Bot error. Please try again later.")
 
-async def message_handler(message: types.Message, state: FSMContext):
+async def message_handler(message: types.Message, state: FSMContext, raw_state: str | None):
     """Handler for text messages"""
     try:
         logger.info(f"Message from {message.from_user.id}: {message.text[:50]}")
         user_id = message.from_user.id
         text = message.text.strip()
         
-        # Check if we're in an admin state
-        current_state = await state.get_state()
+        # Check if we're in an admin state (already read by aiogram's FSM middleware)
+        current_state = raw_state
         if current_state:
             if current_state == AdminStates.ADD_TASK.state:
                 data = await state.get_data()
@@ -549,8 +1016,8 @@ async def message_handler(message: types.Message, state: FSMContext):
                 cl_name = data.get('checklist')
                 
                 if role and cl_name:
-                    checklists[role][cl_name].append(text)
-                    save_checklists()
+                    with editing_checklists() as lists:
+                        lists[role][cl_name].append(text)
                     await message.answer(f"✅ Task added to {cl_name}!")
                     await show_checklist_editor(message, state, role, cl_name)
                 else:
@@ -567,8 +1034,8 @@ async def message_handler(message: types.Message, state: FSMContext):
                 
                 if role and cl_name and task_index is not None:
                     if 0 <= task_index < len(checklists[role][cl_name]):
-                        checklists[role][cl_name][task_index] = text
-                        save_checklists()
+                        with editing_checklists() as lists:
+                            lists[role][cl_name][task_index] = text
                         await message.answer(f"✅ Task updated!")
                         await show_checklist_editor(message, state, role, cl_name)
                     else:
@@ -588,14 +1055,10 @@ async def message_handler(message: types.Message, state: FSMContext):
                 if role and old_name:
                     # Rename checklist
                     if old_name in checklists[role]:
-                        checklists[role][new_name] = checklists[role].pop(old_name)
-                        save_checklists()
+                        with editing_checklists() as lists:
+                            lists[role][new_name] = lists[role].pop(old_name)
                         
-                        # Update assignments if needed
-                        for uid, assignment in user_assignments.items():
-                            if assignment["role"] == role and assignment["checklist"] == old_name:
-                                assignment["checklist"] = new_name
-                        save_user_assignments()
+                        rename_checklist_assignments(role, old_name, new_name)
                         
                         await message.answer(f"✅ Checklist renamed to {new_name}!")
                         await show_checklist_editor(message, state, role, new_name)
@@ -615,8 +1078,8 @@ async def message_handler(message: types.Message, state: FSMContext):
                 if role:
                     # Create new checklist
                     if cl_name not in checklists[role]:
-                        checklists[role][cl_name] = []
-                        save_checklists()
+                        with editing_checklists() as lists:
+                            lists[role][cl_name] = []
                         await message.answer(f"✅ Checklist {cl_name} created!")
                         await show_checklist_editor(message, state, role, cl_name)
                     else:
@@ -660,21 +1123,36 @@ async def message_handler(message: types.Message, state: FSMContext):
                 return
 
         # Normal user flow
-        if user_id not in user_sessions:
-            if text == BOT_PASSWORD:
+        session = user_sessions.get(user_id)
+        if session is None:
+            now = time.monotonic()
+            last_attempt = password_attempts.get(user_id)
+            if last_attempt is not None and now - last_attempt < PASSWORD_RETRY_SECONDS:
+                await message.answer("⏳ Please wait a few seconds before trying again.")
+                return
+            password_attempts[user_id] = now
+            
+            # scrypt is deliberately slow; keep it off the event loop. Read
+            # salt and hash together so a password rotation can't mix them
+            salt, password_hash = bot_state["password_salt"], bot_state["password_hash"]
+            loop = asyncio.get_running_loop()
+            if await loop.run_in_executor(password_executor, check_password, text, salt, password_hash):
+                password_attempts.pop(user_id, None)
                 if is_admin(user_id):
                     await message.answer("✅ Password accepted! You can now use admin commands.")
                     return
                 else:
-                    user_sessions[user_id] = {"step": "name"}
+                    start_session(user_id)
                     await message.answer("✅ Password accepted! Please enter your name:")
             else:
                 await message.answer("❌ Incorrect password. Please try again.")
             return
 
-        if user_sessions[user_id]["step"] == "name":
+        touch_session(user_id, session)
+        
+        if session.step == "name":
             user_name = text
-            user_sessions[user_id]["name"] = user_name
+            session.name = user_name
             
             # Save user data
             if str(user_id) not in user_data:
@@ -690,20 +1168,19 @@ async def message_handler(message: types.Message, state: FSMContext):
                 save_user_data()
             
             # Check if user has an assignment
-            if str(user_id) in user_assignments:
-                assignment = user_assignments[str(user_id)]
+            if user_id in user_assignments:
+                assignment = user_assignments[user_id]
                 role = assignment["role"]
                 cl_name = assignment["checklist"]
                 
                 if role in checklists and cl_name in checklists[role]:
-                    user_sessions[user_id].update({
-                        "role": role,
-                        "checklist": cl_name,
-                        "tasks": checklists[role][cl_name],
-                        "current_task": 0,
-                        "results": [],
-                        "step": "task"
-                    })
+                    session.role = role
+                    session.checklist = cl_name
+                    session.tasks = checklists[role][cl_name]
+                    session.current_task = 0
+                    session.results = []
+                    session.task_message_id = None
+                    session.step = "task"
                     
                     await send_task(
                         bot=message.bot,
@@ -714,31 +1191,24 @@ async def message_handler(message: types.Message, state: FSMContext):
                     await message.answer("❌ Your assigned checklist is no longer available. Please contact admin.")
             else:
                 await message.answer("❌ You don't have an assigned checklist. Please contact admin.")
-    except Exception as e:
-        logger.error(f"Error in message_handler: {e}\n{traceback.format_exc()}")
+    except Exception:
+        logger.exception("Error in message_handler")
         await message.answer("❌ Error processing your message. Please try /start again.")
 
 # ========== ADMIN COMMANDS ==========
+async def show_role_select(message, state: FSMContext, edit=False):
+    """Enter role selection, sending or editing in the role keyboard"""
+    await state.set_state(AdminStates.SELECT_ROLE)
+    send = message.edit_text if edit else message.answer
+    await send("Select a role to edit checklists:", reply_markup=roles_keyboard())
+
 async def edit_checklists_handler(message: types.Message, state: FSMContext):
     """Handler for /edit_checklists command"""
     if not is_admin(message.from_user.id):
         await message.answer("❌ You don't have permission to use this command.")
         return
         
-    await state.set_state(AdminStates.SELECT_ROLE)
-    
-    # Create role selection buttons
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[])
-    for role in checklists.keys():
-        keyboard.inline_keyboard.append([
-            InlineKeyboardButton(text=role, callback_data=f"admin_role:{role}")
-        ])
-    
-    keyboard.inline_keyboard.append([
-        InlineKeyboardButton(text="⬅️ Cancel", callback_data="admin_cancel")
-    ])
-        
-    await message.answer("Select a role to edit checklists:", reply_markup=keyboard)
+    await show_role_select(message, state)
 
 async def manage_assignments_handler(message: types.Message, state: FSMContext):
     """Handler for /manage_assignments command"""
@@ -747,7 +1217,7 @@ async def manage_assignments_handler(message: types.Message, state: FSMContext):
         return
         
     await state.set_state(AdminStates.MANAGE_ASSIGNMENTS)
-    keyboard = assignments_keyboard()
+    keyboard = ASSIGNMENTS_KB
     await message.answer("👤 User Assignments Management:", reply_markup=keyboard)
 
 async def manage_users_handler(message: types.Message, state: FSMContext):
@@ -757,7 +1227,7 @@ async def manage_users_handler(message: types.Message, state: FSMContext):
         return
         
     await state.set_state(AdminStates.MANAGE_USERS)
-    keyboard = users_management_keyboard()
+    keyboard = USERS_KB
     await message.answer("👥 User Management:", reply_markup=keyboard)
 
 async def manage_notifications_handler(message: types.Message, state: FSMContext):
@@ -767,7 +1237,7 @@ async def manage_notifications_handler(message: types.Message, state: FSMContext
         return
         
     await state.set_state(AdminStates.MANAGE_NOTIFICATIONS)
-    keyboard = notifications_keyboard()
+    keyboard = NOTIFICATIONS_KB
     await message.answer("🔔 Notifications Management:", reply_markup=keyboard)
 
 async def view_statistics_handler(message: types.Message, state: FSMContext):
@@ -777,7 +1247,7 @@ async def view_statistics_handler(message: types.Message, state: FSMContext):
         return
         
     await state.set_state(AdminStates.VIEW_STATISTICS)
-    keyboard = statistics_keyboard()
+    keyboard = STATISTICS_KB
     await message.answer("📊 Statistics:", reply_markup=keyboard)
 
 async def reports_handler(message: types.Message, state: FSMContext):
@@ -787,7 +1257,7 @@ async def reports_handler(message: types.Message, state: FSMContext):
         return
         
     await state.set_state(AdminStates.VIEW_REPORTS)
-    keyboard = reports_keyboard()
+    keyboard = REPORTS_KB
     await message.answer("📊 Reports Management:", reply_markup=keyboard)
 
 async def generate_password_handler(message: types.Message, state: FSMContext):
@@ -819,7 +1289,7 @@ async def show_checklist_editor(message, state, role, cl_name):
             return
         
         tasks = checklists[role][cl_name]
-        keyboard = tasks_keyboard(tasks)
+        keyboard = tasks_keyboard(get_checklist_id(role, cl_name), tasks)
         
         # Store current context
         await state.update_data(role=role, checklist=cl_name)
@@ -861,7 +1331,10 @@ async def admin_callback_handler(callback: types.CallbackQuery, state: FSMContex
             
         # Handle admin operations
         if data.startswith("admin_role:"):
-            role = data.split(":")[1]
+            role = get_role_by_id(int(data.split(":")[1]))
+            if not role:
+                await callback.message.answer("❌ Role not found!")
+                return
             await state.set_state(AdminStates.SELECT_CHECKLIST)
             await state.update_data(role=role)
             
@@ -872,14 +1345,13 @@ async def admin_callback_handler(callback: types.CallbackQuery, state: FSMContex
             )
         
         elif data.startswith("cl:"):
-            cl_name = data.split(":")[1]
-            state_data = await state.get_data()
-            role = state_data.get('role')
+            ref = checklist_refs.get(int(data.split(":")[1]))
             
-            if role:
+            if ref:
+                role, cl_name = ref
                 await show_checklist_editor(callback, state, role, cl_name)
             else:
-                await callback.message.answer("❌ Role not selected!")
+                await callback.message.answer("❌ Checklist not found!")
         
         elif data == "add_checklist":
             await state.set_state(AdminStates.NEW_CHECKLIST)
@@ -894,13 +1366,11 @@ async def admin_callback_handler(callback: types.CallbackQuery, state: FSMContex
             await callback.message.answer("Please enter the new name for this checklist:")
         
         elif data.startswith("edit_task:"):
-            task_index = int(data.split(":")[1])
+            _, cl_id, task_index = data.split(":")
+            task_index = int(task_index)
+            role, cl_name = checklist_refs.get(int(cl_id), (None, None))
             await state.set_state(AdminStates.EDIT_TASK)
-            await state.update_data(task_index=task_index)
-            
-            state_data = await state.get_data()
-            role = state_data.get('role')
-            cl_name = state_data.get('checklist')
+            await state.update_data(role=role, checklist=cl_name, task_index=task_index)
             
             if role and cl_name and 0 <= task_index < len(checklists[role][cl_name]):
                 task_text = checklists[role][cl_name][task_index]
@@ -912,19 +1382,17 @@ async def admin_callback_handler(callback: types.CallbackQuery, state: FSMContex
                 await callback.message.answer("❌ Task not found!")
         
         elif data.startswith("delete_task:"):
-            task_index = int(data.split(":")[1])
+            _, cl_id, task_index = data.split(":")
+            task_index = int(task_index)
+            role, cl_name = checklist_refs.get(int(cl_id), (None, None))
             await state.set_state(AdminStates.CONFIRM_DELETE_TASK)
-            await state.update_data(task_index=task_index)
-            
-            state_data = await state.get_data()
-            role = state_data.get('role')
-            cl_name = state_data.get('checklist')
+            await state.update_data(role=role, checklist=cl_name, task_index=task_index)
             
             if role and cl_name and 0 <= task_index < len(checklists[role][cl_name]):
                 task_text = checklists[role][cl_name][task_index]
                 
                 keyboard = InlineKeyboardMarkup(inline_keyboard=[
-                    [InlineKeyboardButton(text="✅ Yes, delete", callback_data=f"confirm_delete_task:{task_index}")],
+                    [InlineKeyboardButton(text="✅ Yes, delete", callback_data=f"confirm_delete_task:{cl_id}:{task_index}")],
                     [InlineKeyboardButton(text="❌ Cancel", callback_data="cancel_delete")]
                 ])
                 
@@ -936,14 +1404,13 @@ async def admin_callback_handler(callback: types.CallbackQuery, state: FSMContex
                 await callback.message.answer("❌ Task not found!")
         
         elif data.startswith("confirm_delete_task:"):
-            task_index = int(data.split(":")[1])
-            state_data = await state.get_data()
-            role = state_data.get('role')
-            cl_name = state_data.get('checklist')
+            _, cl_id, task_index = data.split(":")
+            task_index = int(task_index)
+            role, cl_name = checklist_refs.get(int(cl_id), (None, None))
             
             if role and cl_name and 0 <= task_index < len(checklists[role][cl_name]):
-                deleted_task = checklists[role][cl_name].pop(task_index)
-                save_checklists()
+                with editing_checklists() as lists:
+                    deleted_task = lists[role][cl_name].pop(task_index)
                 await callback.message.answer(f"✅ Task deleted:\n{deleted_task}")
                 await show_checklist_editor(callback, state, role, cl_name)
             else:
@@ -952,16 +1419,15 @@ async def admin_callback_handler(callback: types.CallbackQuery, state: FSMContex
             await state.set_state(AdminStates.EDIT_CHECKLIST)
         
         elif data.startswith("delete_cl:"):
-            cl_name = data.split(":")[1]
+            cl_id = int(data.split(":")[1])
+            ref = checklist_refs.get(cl_id)
             await state.set_state(AdminStates.CONFIRM_DELETE_CHECKLIST)
-            await state.update_data(delete_cl_name=cl_name)
-            
-            state_data = await state.get_data()
-            role = state_data.get('role')
             
-            if role:
+            if ref:
+                role, cl_name = ref
+                await state.update_data(role=role, delete_cl_name=cl_name)
                 keyboard = InlineKeyboardMarkup(inline_keyboard=[
-                    [InlineKeyboardButton(text="✅ Yes, delete", callback_data=f"confirm_delete_cl:{cl_name}")],
+                    [InlineKeyboardButton(text="✅ Yes, delete", callback_data=f"confirm_delete_cl:{cl_id}")],
                     [InlineKeyboardButton(text="❌ Cancel", callback_data="cancel_delete")]
                 ])
                 
@@ -970,38 +1436,22 @@ async def admin_callback_handler(callback: types.CallbackQuery, state: FSMContex
                     reply_markup=keyboard
                 )
             else:
-                await callback.message.answer("❌ Role not selected!")
+                await callback.message.answer("❌ Checklist not found!")
         
         elif data.startswith("confirm_delete_cl:"):
-            cl_name = data.split(":")[1]
-            state_data = await state.get_data()
-            role = state_data.get('role')
+            ref = checklist_refs.get(int(data.split(":")[1]))
             
-            if role and cl_name in checklists.get(role, {}):
-                checklists[role].pop(cl_name)
-                save_checklists()
+            if ref:
+                role, cl_name = ref
+                with editing_checklists() as lists:
+                    lists[role].pop(cl_name)
                 
-                # Remove assignments to this checklist
-                for uid, assignment in list(user_assignments.items()):
-                    if assignment["role"] == role and assignment["checklist"] == cl_name:
-                        del user_assignments[uid]
-                save_user_assignments()
+                drop_checklist_assignments(role, cl_name)
                 
                 await callback.message.answer(f"✅ Checklist '{cl_name}' deleted!")
                 
                 # Return to role selection
-                await state.set_state(AdminStates.SELECT_ROLE)
-                keyboard = InlineKeyboardMarkup(inline_keyboard=[])
-                for role_name in checklists.keys():
-                    keyboard.inline_keyboard.append([
-                        InlineKeyboardButton(text=role_name, callback_data=f"admin_role:{role_name}")
-                    ])
-                    
-                keyboard.inline_keyboard.append([
-                    InlineKeyboardButton(text="⬅️ Cancel", callback_data="admin_cancel")
-                ])
-                
-                await callback.message.edit_text("Select a role to edit checklists:", reply_markup=keyboard)
+                await show_role_select(callback.message, state, edit=True)
             else:
                 await callback.message.answer("❌ Checklist not found!")
         
@@ -1032,27 +1482,15 @@ async def admin_callback_handler(callback: types.CallbackQuery, state: FSMContex
                 await callback.message.answer("❌ Role not selected!")
         
         elif data == "back_to_roles":
-            await state.set_state(AdminStates.SELECT_ROLE)
-            
-            keyboard = InlineKeyboardMarkup(inline_keyboard=[])
-            for role in checklists.keys():
-                keyboard.inline_keyboard.append([
-                    InlineKeyboardButton(text=role, callback_data=f"admin_role:{role}")
-                ])
-            
-            keyboard.inline_keyboard.append([
-                InlineKeyboardButton(text="⬅️ Cancel", callback_data="admin_cancel")
-            ])
-                
-            await callback.message.edit_text(
-                "Select a role to edit checklists:",
-                reply_markup=keyboard
-            )
+            await show_role_select(callback.message, state, edit=True)
         
         elif data == "gen_pass_confirm":
-            global BOT_PASSWORD
             new_password = generate_password()
-            BOT_PASSWORD = new_password
+            loop = asyncio.get_running_loop()
+            salt, digest = await loop.run_in_executor(password_executor, hash_password, new_password)
+            # Only the hash is kept; the plaintext lives in this reply alone
+            bot_state.update(password_salt=salt, password_hash=digest)
+            save_bot_state()
             
             await callback.message.answer(
                 f"✅ New password generated:\n<code>{new_password}</code>\n\n"
@@ -1067,36 +1505,18 @@ async def admin_callback_handler(callback: types.CallbackQuery, state: FSMContex
                 await callback.message.answer("📭 No reports available.")
                 return
                 
-            response = "📋 Last 10 Reports:\n\n"
-            for i, report_file in enumerate(reports, 1):
-                try:
-                    with open(report_file, 'r') as f:
-                        report = json.load(f)
-                        done_count = sum(1 for _, status in report['results'] if status == 'Done')
-                        not_done_count = sum(1 for _, status in report['results'] if status != 'Done')
-                        
-                        response += (
-                            f"{i}. {report['date']}\n"
-                            f"👤 {report['user_name']} (ID: {report['user_id']})\n"
-                            f"🏷️ Role: {report['role']} - {report['checklist']}\n"
-                            f"✅ Done: {done_count}\n"
-                            f"❌ Not Done: {not_done_count}\n\n"
-                        )
-                except Exception as e:
-                    logger.error(f"Error reading report {report_file}: {e}")
-                    response += f"{i}. Error reading report\n\n"
-            
+            response = await asyncio.to_thread(render_reports_list, reports)
             await callback.message.answer(response)
         
         elif data == "download_reports":
-            csv_file = generate_csv_report()
+            csv_file = await asyncio.to_thread(generate_csv_report)
             await callback.message.answer_document(
                 FSInputFile(csv_file),
                 caption="📥 All reports in CSV format"
             )
         
         elif data == "clear_reports":
-            deleted_count = clear_reports()
+            deleted_count = await asyncio.to_thread(clear_reports)
             await callback.message.answer(f"🧹 Deleted {deleted_count} reports!")
         
         elif data == "admin_cancel":
@@ -1104,8 +1524,9 @@ async def admin_callback_handler(callback: types.CallbackQuery, state: FSMContex
             await callback.message.answer("Admin operation cancelled.")
         
         # ========== ASSIGNMENT MANAGEMENT ==========
-        elif data == "assign_user":
+        elif data == "assign_user" or data.startswith("assign_user_page:"):
             await state.set_state(AdminStates.SELECT_USER_TO_ASSIGN)
+            page = int(data.split(":")[1]) if ":" in data else 0
             
             # Get all users that have started the bot
             known_users = set()
@@ -1118,16 +1539,15 @@ async def admin_callback_handler(callback: types.CallbackQuery, state: FSMContex
                 await callback.message.answer("❌ No users found. Users must start the bot first.")
                 return
                 
-            keyboard = InlineKeyboardMarkup(inline_keyboard=[])
-            for uid in known_users:
-                user_name = get_user_name(uid)
-                keyboard.inline_keyboard.append([
-                    InlineKeyboardButton(text=f"{user_name} (ID: {uid})", callback_data=f"assign_user:{uid}")
-                ])
-                
-            keyboard.inline_keyboard.append([
-                InlineKeyboardButton(text="⬅️ Back", callback_data="back_to_assignments")
-            ])
+            page_users, nav = paginate(sorted(known_users), page, "assign_user_page")
+            rows = [
+                [InlineKeyboardButton(text=f"{get_user_name(uid)} (ID: {uid})", callback_data=f"assign_user:{uid}")]
+                for uid in page_users
+            ]
+            if nav:
+                rows.append(nav)
+            rows.append([InlineKeyboardButton(text="⬅️ Back", callback_data="back_to_assignments")])
+            keyboard = InlineKeyboardMarkup(inline_keyboard=rows)
             
             await callback.message.edit_text("Select user to assign checklist:", reply_markup=keyboard)
         
@@ -1136,16 +1556,7 @@ async def admin_callback_handler(callback: types.CallbackQuery, state: FSMContex
             await state.update_data(assign_user_id=user_id)
             await state.set_state(AdminStates.SELECT_ROLE_TO_ASSIGN)
             
-            keyboard = InlineKeyboardMarkup(inline_keyboard=[])
-            for role in checklists.keys():
-                keyboard.inline_keyboard.append([
-                    InlineKeyboardButton(text=role, callback_data=f"assign_role:{role}")
-                ])
-                
-            keyboard.inline_keyboard.append([
-                InlineKeyboardButton(text="⬅️ Back", callback_data="assign_user")
-            ])
-            
+            keyboard = assign_roles_keyboard()
             user_name = get_user_name(user_id)
             await callback.message.edit_text(
                 f"Select role for {user_name}:",
@@ -1153,26 +1564,25 @@ async def admin_callback_handler(callback: types.CallbackQuery, state: FSMContex
             )
         
         elif data.startswith("assign_role:"):
-            role = data.split(":")[1]
+            role = get_role_by_id(int(data.split(":")[1]))
             state_data = await state.get_data()
             user_id = state_data.get('assign_user_id')
             
             if not user_id:
                 await callback.message.answer("❌ User not selected!")
                 return
+            if not role:
+                await callback.message.answer("❌ Role not found!")
+                return
                 
-            await state.update_data(assign_role=role)
             await state.set_state(AdminStates.SELECT_CHECKLIST_TO_ASSIGN)
             
-            keyboard = InlineKeyboardMarkup(inline_keyboard=[])
-            for cl_name in checklists[role].keys():
-                keyboard.inline_keyboard.append([
-                    InlineKeyboardButton(text=cl_name, callback_data=f"assign_checklist:{cl_name}")
-                ])
-                
-            keyboard.inline_keyboard.append([
-                InlineKeyboardButton(text="⬅️ Back", callback_data=f"assign_user:{user_id}")
-            ])
+            rows = [
+                [InlineKeyboardButton(text=cl_name, callback_data=f"assign_checklist:{get_checklist_id(role, cl_name)}")]
+                for cl_name in checklists[role]
+            ]
+            rows.append([InlineKeyboardButton(text="⬅️ Back", callback_data=f"assign_user:{user_id}")])
+            keyboard = InlineKeyboardMarkup(inline_keyboard=rows)
             
             user_name = get_user_name(user_id)
             await callback.message.edit_text(
@@ -1181,21 +1591,15 @@ async def admin_callback_handler(callback: types.CallbackQuery, state: FSMContex
             )
         
         elif data.startswith("assign_checklist:"):
-            cl_name = data.split(":")[1]
+            role, cl_name = checklist_refs.get(int(data.split(":")[1]), (None, None))
             state_data = await state.get_data()
             user_id = state_data.get('assign_user_id')
-            role = state_data.get('assign_role')
             
             if not user_id or not role:
                 await callback.message.answer("❌ Missing assignment data!")
                 return
                 
-            # Save assignment
-            user_assignments[str(user_id)] = {
-                "role": role,
-                "checklist": cl_name
-            }
-            save_user_assignments()
+            assign_checklist(user_id, role, cl_name)
             
             user_name = get_user_name(user_id)
             await callback.message.answer(
@@ -1207,51 +1611,56 @@ async def admin_callback_handler(callback: types.CallbackQuery, state: FSMContex
             
             # Return to assignments menu
             await state.set_state(AdminStates.MANAGE_ASSIGNMENTS)
-            keyboard = assignments_keyboard()
+            keyboard = ASSIGNMENTS_KB
             await callback.message.answer("👤 User Assignments Management:", reply_markup=keyboard)
         
-        elif data == "view_assignments":
+        elif data == "view_assignments" or data.startswith("view_assignments_page:"):
             if not user_assignments:
                 await callback.message.answer("📭 No assignments found.")
                 return
                 
-            response = "📋 Current Assignments:\n\n"
-            for uid, assignment in user_assignments.items():
-                user_name = get_user_name(int(uid))
-                response += f"👤 {user_name} (ID: {uid})\n"
-                response += f"🏷️ Role: {assignment['role']}\n"
-                response += f"📋 Checklist: {assignment['checklist']}\n\n"
+            # One page per message, flipped in place with the ⬅️/➡️ row
+            page = int(data.split(":")[1]) if ":" in data else 0
+            page_assignments, nav = paginate(list(user_assignments.items()), page, "view_assignments_page")
+            response = "📋 Current Assignments:\n\n" + "".join(
+                f"👤 {get_user_name(uid)} (ID: {uid})\n"
+                f"🏷️ Role: {assignment['role']}\n"
+                f"📋 Checklist: {assignment['checklist']}\n\n"
+                for uid, assignment in page_assignments
+            )
+            keyboard = InlineKeyboardMarkup(inline_keyboard=[nav]) if nav else None
             
-            await callback.message.answer(response)
+            if data == "view_assignments":
+                await callback.message.answer(response, reply_markup=keyboard)
+            else:
+                await callback.message.edit_text(response, reply_markup=keyboard)
         
-        elif data == "remove_assignment":
+        elif data == "remove_assignment" or data.startswith("remove_assignment_page:"):
             if not user_assignments:
                 await callback.message.answer("📭 No assignments to remove.")
                 return
                 
-            keyboard = InlineKeyboardMarkup(inline_keyboard=[])
-            for uid, assignment in user_assignments.items():
-                user_name = get_user_name(int(uid))
-                keyboard.inline_keyboard.append([
-                    InlineKeyboardButton(
-                        text=f"{user_name} - {assignment['role']} - {assignment['checklist']}",
-                        callback_data=f"remove_assignment:{uid}"
-                    )
-                ])
-                
-            keyboard.inline_keyboard.append([
-                InlineKeyboardButton(text="⬅️ Back", callback_data="back_to_assignments")
-            ])
+            page = int(data.split(":")[1]) if ":" in data else 0
+            page_assignments, nav = paginate(list(user_assignments.items()), page, "remove_assignment_page")
+            rows = [
+                [InlineKeyboardButton(
+                    text=f"{get_user_name(uid)} - {assignment['role']} - {assignment['checklist']}",
+                    callback_data=f"remove_assignment:{uid}"
+                )]
+                for uid, assignment in page_assignments
+            ]
+            if nav:
+                rows.append(nav)
+            rows.append([InlineKeyboardButton(text="⬅️ Back", callback_data="back_to_assignments")])
+            keyboard = InlineKeyboardMarkup(inline_keyboard=rows)
             
             await callback.message.edit_text("Select assignment to remove:", reply_markup=keyboard)
         
         elif data.startswith("remove_assignment:"):
-            uid = data.split(":")[1]
-            if uid in user_assignments:
-                assignment = user_assignments.pop(uid)
-                save_user_assignments()
-                
-                user_name = get_user_name(int(uid))
+            uid = int(data.split(":")[1])
+            assignment = unassign_user(uid)
+            if assignment:
+                user_name = get_user_name(uid)
                 await callback.message.answer(
                     f"✅ Assignment removed!\n"
                     f"👤 User: {user_name}\n"
@@ -1263,12 +1672,12 @@ async def admin_callback_handler(callback: types.CallbackQuery, state: FSMContex
                 
             # Return to assignments menu
             await state.set_state(AdminStates.MANAGE_ASSIGNMENTS)
-            keyboard = assignments_keyboard()
+            keyboard = ASSIGNMENTS_KB
             await callback.message.answer("👤 User Assignments Management:", reply_markup=keyboard)
         
         elif data == "back_to_assignments":
             await state.set_state(AdminStates.MANAGE_ASSIGNMENTS)
-            keyboard = assignments_keyboard()
+            keyboard = ASSIGNMENTS_KB
             await callback.message.edit_text("👤 User Assignments Management:", reply_markup=keyboard)
         
         # ========== USER MANAGEMENT ==========
@@ -1289,26 +1698,30 @@ async def admin_callback_handler(callback: types.CallbackQuery, state: FSMContex
             
             await callback.message.answer(response)
         
-        elif data == "make_admin":
+        elif data == "make_admin" or data.startswith("make_admin_page:"):
             if not user_data:
                 await callback.message.answer("📭 No users found.")
                 return
                 
-            keyboard = InlineKeyboardMarkup(inline_keyboard=[])
-            for uid, user_info in user_data.items():
-                if not user_info.get('is_admin', False) and int(uid) not in ADMIN_IDS:
-                    user_name = user_info.get('name', 'Unknown')
-                    keyboard.inline_keyboard.append([
-                        InlineKeyboardButton(text=f"{user_name} (ID: {uid})", callback_data=f"make_admin:{uid}")
-                    ])
+            candidates = [
+                (uid, user_info) for uid, user_info in user_data.items()
+                if not user_info.get('is_admin', False) and int(uid) not in ADMIN_IDS
+            ]
                     
-            if not keyboard.inline_keyboard:
+            if not candidates:
                 await callback.message.answer("✅ All users are already admins!")
                 return
                 
-            keyboard.inline_keyboard.append([
-                InlineKeyboardButton(text="⬅️ Back", callback_data="back_to_users")
-            ])
+            page = int(data.split(":")[1]) if ":" in data else 0
+            page_users, nav = paginate(candidates, page, "make_admin_page")
+            rows = [
+                [InlineKeyboardButton(text=f"{user_info.get('name', 'Unknown')} (ID: {uid})", callback_data=f"make_admin:{uid}")]
+                for uid, user_info in page_users
+            ]
+            if nav:
+                rows.append(nav)
+            rows.append([InlineKeyboardButton(text="⬅️ Back", callback_data="back_to_users")])
+            keyboard = InlineKeyboardMarkup(inline_keyboard=rows)
             
             await callback.message.edit_text("Select user to make admin:", reply_markup=keyboard)
         
@@ -1325,29 +1738,33 @@ async def admin_callback_handler(callback: types.CallbackQuery, state: FSMContex
                 
             # Return to users menu
             await state.set_state(AdminStates.MANAGE_USERS)
-            keyboard = users_management_keyboard()
+            keyboard = USERS_KB
             await callback.message.answer("👥 User Management:", reply_markup=keyboard)
         
-        elif data == "remove_admin":
+        elif data == "remove_admin" or data.startswith("remove_admin_page:"):
             if not user_data:
                 await callback.message.answer("📭 No users found.")
                 return
                 
-            keyboard = InlineKeyboardMarkup(inline_keyboard=[])
-            for uid, user_info in user_data.items():
-                if user_info.get('is_admin', False) and int(uid) not in ADMIN_IDS:
-                    user_name = user_info.get('name', 'Unknown')
-                    keyboard.inline_keyboard.append([
-                        InlineKeyboardButton(text=f"{user_name} (ID: {uid})", callback_data=f"remove_admin:{uid}")
-                    ])
+            admins = [
+                (uid, user_info) for uid, user_info in user_data.items()
+                if user_info.get('is_admin', False) and int(uid) not in ADMIN_IDS
+            ]
                     
-            if not keyboard.inline_keyboard:
+            if not admins:
                 await callback.message.answer("❌ No removable admins found!")
                 return
                 
-            keyboard.inline_keyboard.append([
-                InlineKeyboardButton(text="⬅️ Back", callback_data="back_to_users")
-            ])
+            page = int(data.split(":")[1]) if ":" in data else 0
+            page_admins, nav = paginate(admins, page, "remove_admin_page")
+            rows = [
+                [InlineKeyboardButton(text=f"{user_info.get('name', 'Unknown')} (ID: {uid})", callback_data=f"remove_admin:{uid}")]
+                for uid, user_info in page_admins
+            ]
+            if nav:
+                rows.append(nav)
+            rows.append([InlineKeyboardButton(text="⬅️ Back", callback_data="back_to_users")])
+            keyboard = InlineKeyboardMarkup(inline_keyboard=rows)
             
             await callback.message.edit_text("Select admin to remove:", reply_markup=keyboard)
         
@@ -1364,12 +1781,12 @@ async def admin_callback_handler(callback: types.CallbackQuery, state: FSMContex
                 
             # Return to users menu
             await state.set_state(AdminStates.MANAGE_USERS)
-            keyboard = users_management_keyboard()
+            keyboard = USERS_KB
             await callback.message.answer("👥 User Management:", reply_markup=keyboard)
         
         elif data == "back_to_users":
             await state.set_state(AdminStates.MANAGE_USERS)
-            keyboard = users_management_keyboard()
+            keyboard = USERS_KB
             await callback.message.edit_text("👥 User Management:", reply_markup=keyboard)
         
         # ========== NOTIFICATIONS MANAGEMENT ==========
@@ -1387,23 +1804,27 @@ async def admin_callback_handler(callback: types.CallbackQuery, state: FSMContex
             await state.set_state(AdminStates.SET_NOTIFICATION_TIME)
             await callback.message.answer("Please enter the reminder time in HH:MM format (e.g., 09:00):")
         
-        elif data == "manage_user_notifications":
+        elif data == "manage_user_notifications" or data.startswith("manage_user_notifications_page:"):
             if not user_data:
                 await callback.message.answer("📭 No users found.")
                 return
                 
-            keyboard = InlineKeyboardMarkup(inline_keyboard=[])
-            for uid, user_info in user_data.items():
-                user_name = user_info.get('name', 'Unknown')
-                notifications_enabled = notification_settings['users'].get(uid, {}).get('enabled', True)
-                status = "✅" if notifications_enabled else "❌"
-                keyboard.inline_keyboard.append([
-                    InlineKeyboardButton(text=f"{status} {user_name} (ID: {uid})", callback_data=f"toggle_user_notification:{uid}")
+            page = int(data.split(":")[1]) if ":" in data else 0
+            page_users, nav = paginate(list(user_data.items()), page, "manage_user_notifications_page")
+            user_settings = notification_settings['users']
+            rows = []
+            for uid, user_info in page_users:
+                status = "✅" if user_settings.get(uid, {}).get('enabled', True) else "❌"
+                rows.append([
+                    InlineKeyboardButton(
+                        text=f"{status} {user_info.get('name', 'Unknown')} (ID: {uid})",
+                        callback_data=f"toggle_user_notification:{uid}"
+                    )
                 ])
-                
-            keyboard.inline_keyboard.append([
-                InlineKeyboardButton(text="⬅️ Back", callback_data="back_to_notifications")
-            ])
+            if nav:
+                rows.append(nav)
+            rows.append([InlineKeyboardButton(text="⬅️ Back", callback_data="back_to_notifications")])
+            keyboard = InlineKeyboardMarkup(inline_keyboard=rows)
             
             await callback.message.edit_text("Select user to toggle notifications:", reply_markup=keyboard)
         
@@ -1422,17 +1843,17 @@ async def admin_callback_handler(callback: types.CallbackQuery, state: FSMContex
             
             # Return to notifications menu
             await state.set_state(AdminStates.MANAGE_NOTIFICATIONS)
-            keyboard = notifications_keyboard()
+            keyboard = NOTIFICATIONS_KB
             await callback.message.answer("🔔 Notifications Management:", reply_markup=keyboard)
         
         elif data == "back_to_notifications":
             await state.set_state(AdminStates.MANAGE_NOTIFICATIONS)
-            keyboard = notifications_keyboard()
+            keyboard = NOTIFICATIONS_KB
             await callback.message.edit_text("🔔 Notifications Management:", reply_markup=keyboard)
         
         # ========== STATISTICS ==========
         elif data == "user_activity_stats":
-            stats = get_user_activity_stats()
+            stats = await asyncio.to_thread(get_user_activity_stats)
             if not stats:
                 await callback.message.answer("📊 No activity data available.")
                 return
@@ -1450,7 +1871,7 @@ async def admin_callback_handler(callback: types.CallbackQuery, state: FSMContex
             await callback.message.answer(response)
         
         elif data == "completion_stats":
-            stats = get_completion_stats()
+            stats = await asyncio.to_thread(get_completion_stats)
             if not stats or stats['total_checklists'] == 0:
                 await callback.message.answer("📊 No completion data available.")
                 return
@@ -1480,7 +1901,7 @@ async def admin_callback_handler(callback: types.CallbackQuery, state: FSMContex
             await callback.message.answer(response)
         
         elif data == "checklist_stats":
-            stats = get_completion_stats()
+            stats = await asyncio.to_thread(get_completion_stats)
             if not stats or not stats['by_checklist']:
                 await callback.message.answer("📊 No checklist data available.")
                 return
@@ -1495,15 +1916,15 @@ async def admin_callback_handler(callback: types.CallbackQuery, state: FSMContex
         
         elif data == "back_to_statistics":
             await state.set_state(AdminStates.VIEW_STATISTICS)
-            keyboard = statistics_keyboard()
+            keyboard = STATISTICS_KB
             await callback.message.edit_text("📊 Statistics:", reply_markup=keyboard)
         
         else:
             logger.warning(f"Unhandled callback data: {data}")
             await callback.answer("❌ Unknown command")
             
-    except Exception as e:
-        logger.error(f"Error in admin_callback_handler: {e}\n{traceback.format_exc()}")
+    except Exception:
+        logger.exception("Error in admin_callback_handler")
         await callback.message.answer("❌ Admin operation error. Please try again.")
 
 # ========== USER FLOW HANDLERS ==========
@@ -1515,16 +1936,17 @@ async def callback_handler(callback: types.CallbackQuery):
         data = callback.data
 
         if data.startswith("task:"):
-            if user_id not in user_sessions or user_sessions[user_id].get("step") != "task":
+            session = user_sessions.get(user_id)
+            if session is None or session.step != "task":
                 await callback.message.answer("❌ Session expired. Please restart with /start")
                 return
                 
+            touch_session(user_id, session)
             result = data.split(":")[1]
-            session = user_sessions[user_id]
-            session["results"].append((session["tasks"][session["current_task"]], result))
-            session["current_task"] += 1
+            session.results.append((session.tasks[session.current_task], result))
+            session.current_task += 1
             
-            if session["current_task"] < len(session["tasks"]):
+            if session.current_task < len(session.tasks):
                 await send_task(
                     bot=callback.bot, 
                     chat_id=callback.message.chat.id, 
@@ -1535,84 +1957,119 @@ async def callback_handler(callback: types.CallbackQuery):
         else:
             logger.warning(f"Unhandled user callback data: {data}")
             await callback.answer("❌ Unknown command")
-    except Exception as e:
-        logger.error(f"Error in callback_handler: {e}\n{traceback.format_exc()}")
+    except Exception:
+        logger.exception("Error in callback_handler")
         await callback.message.answer("❌ Processing error. Please restart with /start command.")
 
 async def send_task(bot: Bot, chat_id: int, user_id: int):
     """Send task to user using bot instance"""
     try:
-        if user_id not in user_sessions or user_sessions[user_id].get("step") != "task":
+        session = user_sessions.get(user_id)
+        if session is None or session.step != "task":
             await bot.send_message(chat_id, "❌ Session expired. Please restart with /start")
             return
             
-        session = user_sessions[user_id]
-        task_text = session["tasks"][session["current_task"]]
+        task_text = session.tasks[session.current_task]
         
-        # Create response buttons
-        keyboard = InlineKeyboardMarkup(inline_keyboard=[[
-            InlineKeyboardButton(text="✅ Done", callback_data="task:Done"),
-            InlineKeyboardButton(text="❌ Not Done", callback_data="task:Not Done")
-        ]])
+        keyboard = TASK_KB
+        text = f"Task {session.current_task+1}/{len(session.tasks)}:\n{task_text}"
         
-        await bot.send_message(
+        # Show every task in the same message instead of posting one per task
+        if session.task_message_id:
+            try:
+                await bot.edit_message_text(
+                    text=text,
+                    chat_id=chat_id,
+                    message_id=session.task_message_id,
+                    reply_markup=keyboard
+                )
+                return
+            except TelegramBadRequest:
+                # Message was deleted or is too old to edit; start a new one
+                logger.warning(f"Could not edit task message for user {user_id}")
+        
+        sent = await bot.send_message(
             chat_id=chat_id,
-            text=f"Task {session['current_task']+1}/{len(session['tasks'])}:\n{task_text}", 
+            text=text, 
             reply_markup=keyboard
         )
-    except Exception as e:
-        logger.error(f"Error in send_task: {e}\n{traceback.format_exc()}")
+        session.task_message_id = sent.message_id
+    except Exception:
+        logger.exception("Error in send_task")
         await bot.send_message(chat_id, "❌ Error loading tasks. Please try again later.")
 
 async def finish_checklist(message, user_id):
     """Complete checklist and send report"""
     try:
         session = user_sessions[user_id]
-        report = f"📋 Checklist Report\n👤 Name: {session['name']}\nRole: {session['role']}\nChecklist: {session['checklist']}\n\n"
-        
-        for task, result in session["results"]:
-            status = "✅ Done" if result == "Done" else "❌ Not Done"
-            report += f"- {task} → {status}\n"
+        report = f"📋 Checklist Report\n👤 Name: {session.name}\nRole: {session.role}\nChecklist: {session.checklist}\n\n"
+        report += "".join(
+            f"- {task} → {'✅ Done' if result == 'Done' else '❌ Not Done'}\n"
+            for task, result in session.results
+        )
         
         # Save report
-        save_report(
+        await asyncio.to_thread(
+            save_report,
             user_id=user_id,
-            user_name=session['name'],
-            role=session['role'],
-            cl_name=session['checklist'],
-            results=session["results"]
+            user_name=session.name,
+            role=session.role,
+            cl_name=session.checklist,
+            results=session.results
         )
         
         await message.answer("✅ Checklist completed! Report saved.")
         
-        try:
-            # Send report to all admins
-            for admin_id in ADMIN_IDS:
-                await message.bot.send_message(
-                    admin_id, 
-                    report
-                )
-                logger.info(f"Report sent to admin {admin_id}")
-                
-            # Also send to additional admins from user_data
-            for uid, user_info in user_data.items():
-                if user_info.get('is_admin', False) and int(uid) not in ADMIN_IDS:
-                    try:
-                        await message.bot.send_message(int(uid), report)
-                        logger.info(f"Report sent to admin {uid}")
-                    except Exception as e:
-                        logger.error(f"Error sending report to admin {uid}: {e}")
-        except Exception as e:
-            logger.error(f"Error sending report: {e}\n{traceback.format_exc()}")
-            await message.answer("⚠️ Failed to send report to managers. Please notify admin directly.")
+        # Deliver to admins in the background so this chat's next update
+        # isn't held up behind the fan-out
+        task = asyncio.create_task(broadcast_report(message, report))
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
         
         # Cleanup session
-        if user_id in user_sessions:
-            del user_sessions[user_id]
-    except Exception as e:
-        logger.error(f"Error in finish_checklist: {e}\n{traceback.format_exc()}")
+        user_sessions.pop(user_id, None)
+    except Exception:
+        logger.exception("Error in finish_checklist")
         await message.answer("❌ Error completing checklist. Please contact support.")
 
+async def broadcast_report(message, report):
+    """Send a checklist report to every admin"""
+    try:
+        # Send report to all admins, plus additional admins from user_data,
+        # concurrently; the session middleware paces the burst. Each send
+        # gets its own timeout so one stalled admin can't hold the rest
+        recipients = list(ADMIN_IDS)
+        recipients += [
+            int(uid) for uid, user_info in user_data.items()
+            if user_info.get('is_admin', False) and int(uid) not in ADMIN_IDS
+        ]
+        if not recipients:
+            logger.warning("No admins configured; report not sent")
+            return
+        # Same request body for every admin. The report is plain text
+        # containing user-entered names, so skip the HTML default: Telegram
+        # doesn't parse it, and a stray '<' or '&' can't make the send fail
+        payload = {"text": report, "parse_mode": None}
+        results = await asyncio.gather(
+            *(
+                asyncio.wait_for(message.bot.send_message(admin_id, **payload), REPORT_SEND_TIMEOUT)
+                for admin_id in recipients
+            ),
+            return_exceptions=True
+        )
+        
+        manager_failed = False
+        for admin_id, result in zip(recipients, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error sending report to admin {admin_id}: {result}")
+                manager_failed = manager_failed or admin_id in ADMIN_IDS
+            else:
+                logger.info(f"Report sent to admin {admin_id}")
+        if manager_failed:
+            await message.answer("⚠️ Failed to send report to managers. Please notify admin directly.")
+    except Exception:
+        logger.exception("Error in broadcast_report")
+
 # ========== NOTIFICATION TASK ==========
 async def notification_task(bot: Bot):
     """Background task to send notifications"""
@@ -1624,27 +2081,141 @@ async def notification_task(bot: Bot):
             logger.error(f"Error in notification task: {e}")
             await asyncio.sleep(300)  # Wait 5 minutes on error
 
+# ========== SESSION CLEANUP ==========
+async def session_sweeper():
+    """Background task dropping sessions abandoned mid-flow"""
+    while True:
+        await asyncio.sleep(SESSION_SWEEP_SECONDS)
+        cutoff = time.monotonic() - SESSION_TTL_SECONDS
+        # Sessions are kept oldest first, so stop at the first fresh one
+        expired = 0
+        while user_sessions:
+            uid, session = next(iter(user_sessions.items()))
+            if session.last_activity >= cutoff:
+                break
+            del user_sessions[uid]
+            expired += 1
+        if expired:
+            logger.info(f"Evicted {expired} idle sessions")
+        
+        # Attempts older than the retry gap no longer throttle anyone
+        retry_cutoff = time.monotonic() - PASSWORD_RETRY_SECONDS
+        for uid in [uid for uid, attempt in password_attempts.items() if attempt < retry_cutoff]:
+            del password_attempts[uid]
+
+# ========== TELEGRAM API ==========
+class ConcurrencyLimitMiddleware(BaseRequestMiddleware):
+    """Bound the number of in-flight Telegram API requests"""
+    def __init__(self, limit):
+        self.semaphore = asyncio.Semaphore(limit)
+
+    async def __call__(self, make_request, bot, method):
+        async with self.semaphore:
+            return await make_request(bot, method)
+
+class RateLimitMiddleware(BaseRequestMiddleware):
+    """Pace outbound API requests"""
+    def __init__(self, rate):
+        self.interval = 1 / rate
+        self.next_slot = 0.0
+
+    async def wait_for_slot(self):
+        """Reserve the next send slot, sleeping until it comes up"""
+        now = asyncio.get_running_loop().time()
+        slot = max(now, self.next_slot)
+        self.next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def __call__(self, make_request, bot, method):
+        # Callback answers are not messages and only stop the button spinner
+        if isinstance(method, AnswerCallbackQuery):
+            return await make_request(bot, method)
+        
+        await self.wait_for_slot()
+        return await make_request(bot, method)
+
+# ========== UPDATE QUEUE ==========
+# Webhook updates are acked immediately and processed in the background.
+# Each chat gets its own FIFO drained by a single task, so a user's taps
+# are handled in order while different chats run concurrently.
+chat_queues = {}  # chat_id -> deque of updates, head is being processed
+update_slots = asyncio.Semaphore(MAX_PENDING_UPDATES)
+update_workers = asyncio.Semaphore(BOT_CONCURRENCY)
+
+# Telegram redelivers an update if it never saw our 200 (e.g. a dropped
+# connection), so remember recent update IDs and process each one once
+recent_update_ids = set()
+recent_update_order = deque()
+
+def is_duplicate_update(update_id):
+    """Record an update ID, True if it was already seen recently"""
+    if update_id in recent_update_ids:
+        return True
+    recent_update_ids.add(update_id)
+    recent_update_order.append(update_id)
+    if len(recent_update_order) > RECENT_UPDATES:
+        recent_update_ids.discard(recent_update_order.popleft())
+    return False
+
+def update_chat_id(update):
+    """Chat whose ordering an update belongs to, None if it has no handlers"""
+    if update.message:
+        return update.message.chat.id
+    if update.callback_query:
+        # Button taps share their message's queue, also in group chats
+        if update.callback_query.message:
+            return update.callback_query.message.chat.id
+        return update.callback_query.from_user.id
+    return None
+
+async def drain_chat_queue(dp, bot, chat_id, queue):
+    """Process one chat's updates in arrival order"""
+    try:
+        while queue:
+            try:
+                async with update_workers:
+                    await dp.feed_update(bot, queue[0])
+            except Exception:
+                logger.exception("Error processing update")
+            finally:
+                queue.popleft()
+                update_slots.release()
+    finally:
+        del chat_queues[chat_id]
+
+def enqueue_update(dp, bot, chat_id, update):
+    """Queue an update behind earlier ones from the same chat"""
+    queue = chat_queues.get(chat_id)
+    if queue is not None:
+        queue.append(update)
+        return
+    
+    queue = chat_queues[chat_id] = deque([update])
+    task = asyncio.create_task(drain_chat_queue(dp, bot, chat_id, queue))
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
 # ========== WEBHOOK SETUP ==========
 async def on_startup(bot: Bot):
     """Actions on bot startup"""
     try:
         logger.info("Running startup actions...")
         
-        # Remove old webhook
-        await bot.delete_webhook()
-        logger.info("Old webhook removed")
+        load_reports_index()
+        start_debounced_writers()
         
         if BASE_WEBHOOK_URL:
             webhook_url = f"{BASE_WEBHOOK_URL}{WEBHOOK_PATH}"
             
-            # Use globally defined SECRET_TOKEN
+            # set_webhook replaces any old webhook and drops its queue,
+            # so no separate delete_webhook round trip is needed
             await bot.set_webhook(
                 url=webhook_url,
                 drop_pending_updates=True,
                 secret_token=SECRET_TOKEN
             )
             logger.info(f"Webhook set to: {webhook_url}")
-            logger.info(f"Secret token: {SECRET_TOKEN}")
             
             # Verify webhook setup
             webhook_info = await bot.get_webhook_info()
@@ -1656,13 +2227,26 @@ async def on_startup(bot: Bot):
             else:
                 logger.info("Webhook verified ✅")
         else:
+            await bot.delete_webhook()
+            logger.info("Old webhook removed")
             logger.warning("Skipping webhook setup: BASE_WEBHOOK_URL not set")
             
         # Start notification task
         asyncio.create_task(notification_task(bot))
         logger.info("Notification task started")
-    except Exception as e:
-        logger.error(f"Error in on_startup: {e}\n{traceback.format_exc()}")
+        
+        task = asyncio.create_task(session_sweeper())
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
+    except Exception:
+        logger.exception("Error in on_startup")
+
+async def on_shutdown(bot: Bot):
+    """Actions on bot shutdown"""
+    try:
+        flush_debounced_files()
+    except Exception:
+        logger.exception("Error in on_shutdown")
 
 async def health_check(request: web.Request) -> web.Response:
     """Server health check"""
@@ -1671,11 +2255,32 @@ async def health_check(request: web.Request) -> web.Response:
 # ========== SERVER STARTUP ==========
 def main():
     try:
+        # libuv-based loop; web.run_app creates its loop from this policy
+        if uvloop is not None:
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        logger.info(f"Event loop: {'uvloop' if uvloop else 'asyncio'}")
+        
         logger.info(f"Environment: PORT={os.getenv('PORT')}, RENDER_EXTERNAL_URL={os.getenv('RENDER_EXTERNAL_URL')}")
         
+        # One shared session; every API call (answer, edit_text, send_message)
+        # goes through it, so the middleware bounds all outbound traffic
+        session = AiohttpSession(
+            limit=TELEGRAM_MAX_CONCURRENCY,
+            # aiogram expects str from json_dumps; ours returns bytes
+            json_loads=json_loads,
+            json_dumps=lambda obj: json_dumps(obj).decode()
+        )
+        # aiogram builds its TCPConnector lazily from these kwargs (it already
+        # caches DNS for an hour); only keep-alive needs raising from aiohttp's
+        # 15s default
+        session._connector_init["keepalive_timeout"] = TELEGRAM_KEEPALIVE_SECONDS
+        session.middleware(RateLimitMiddleware(TELEGRAM_MAX_RATE))
+        session.middleware(ConcurrencyLimitMiddleware(TELEGRAM_MAX_CONCURRENCY))
+        
         # Create bot with HTML parsing by default
         bot = Bot(
             TELEGRAM_TOKEN, 
+            session=session,
             default=DefaultBotProperties(parse_mode="HTML")
         )
         
@@ -1693,7 +2298,7 @@ def main():
         dp.message.register(message_handler)
         
         # Callback handlers
-        dp.callback_query.register(admin_callback_handler, F.data.startswith(("admin_", "cl:", "add_", "edit_", "delete_", "back_", "gen_", "view_", "assign_", "remove_", "make_", "toggle_", "confirm_", "cancel_")))
+        dp.callback_query.register(admin_callback_handler, F.data.startswith(("admin_", "cl:", "add_", "edit_", "delete_", "back_", "gen_", "view_", "assign_", "remove_", "make_", "manage_", "toggle_", "confirm_", "cancel_")))
         dp.callback_query.register(callback_handler, F.data.startswith("task:"))
         
         # Unknown callback handler
@@ -1703,40 +2308,57 @@ def main():
         
         # Startup actions
         dp.startup.register(on_startup)
+        dp.shutdown.register(on_shutdown)
         
         # Create aiohttp application
         app = web.Application()
         app["bot"] = bot
         
+        # Emit dispatcher startup/shutdown with the aiohttp app lifecycle
+        setup_application(app, dp, bot=bot)
+        
         # Register endpoints
         app.router.add_get("/", health_check)
         app.router.add_get("/health", health_check)
         
-        # Webhook handler with timeout
+        # Webhook handler: validate, queue and ack without waiting for handlers
         async def webhook_handler(request: web.Request) -> web.Response:
             try:
-                logger.info(f"Incoming webhook request to: {request.path}")
-                
-                # Secret token verification
-                secret_token = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+                # Secret token verification (constant-time, secret never logged)
+                secret_token = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "").encode()
                 
-                # Use globally defined SECRET_TOKEN
-                if secret_token != SECRET_TOKEN:
-                    logger.warning(f"Invalid secret token! Expected: {SECRET_TOKEN}, Got: {secret_token}")
+                if not hmac.compare_digest(secret_token, SECRET_TOKEN_BYTES):
+                    logger.warning("Invalid webhook secret token")
                     return web.Response(status=403, text="Forbidden")
                 
-                # Process update with timeout
-                try:
-                    return await asyncio.wait_for(
-                        SimpleRequestHandler(dispatcher=dp, bot=bot).handle(request),
-                        timeout=10  # 10 seconds timeout
-                    )
-                except asyncio.TimeoutError:
-                    logger.error("Request processing timed out")
-                    return web.Response(status=504, text="Gateway Timeout")
+                # Only messages and callback queries have handlers - ack anything
+                # else before paying for Update validation and filter dispatch.
+                # A false positive (a nested key such as callback_query.message,
+                # or user text that is exactly "message") only means the update
+                # gets parsed and update_chat_id acks it; wanted updates always
+                # contain the top-level key, so none are dropped.
+                body = await request.read()
+                if b'"message"' not in body and b'"callback_query"' not in body:
+                    return web.Response(text="OK")
+                
+                # Parse and validate in one step in pydantic-core, without
+                # building an intermediate dict with the stdlib json module
+                update = types.Update.model_validate_json(body, context={"bot": bot})
+                chat_id = update_chat_id(update)
+                if chat_id is None:
+                    return web.Response(text="OK")
+                if is_duplicate_update(update.update_id):
+                    logger.info(f"Dropping redelivered update {update.update_id}")
+                    return web.Response(text="OK")
+                
+                # Released by drain_chat_queue once the update is processed;
+                # waiting here pushes back on Telegram when the bot is saturated
+                await update_slots.acquire()
+                enqueue_update(dp, bot, chat_id, update)
+                return web.Response(text="OK")
                     
-            except Exception as e:
-                logger.error(f"Critical error in webhook handler: {e}\n{traceback.format_exc()}")
+            except Exception:
+                logger.exception("Critical error in webhook handler")
                 return web.Response(status=500, text="Internal Server Error")
         
         app.router.add_post(WEBHOOK_PATH, webhook_handler)
@@ -1744,13 +2366,14 @@ def main():
         # Logging middleware
         @web.middleware
         async def log_middleware(request: web.Request, handler):
-            logger.info(f"Request: {request.method} {request.path}")
             try:
                 response = await handler(request)
-                logger.info(f"Response status: {response.status}")
+                # One access line per request, formatted only if INFO is on
+                if logger.isEnabledFor(logging.INFO):
+                    logger.info(f"{request.method} {request.path} -> {response.status}")
                 return response
-            except Exception as e:
-                logger.error(f"Unhandled exception: {e}\n{traceback.format_exc()}")
+            except Exception:
+                logger.exception("Unhandled exception")
                 return web.Response(text="Internal Server Error", status=500)
         
         app.middlewares.append(log_middleware)
@@ -1763,8 +2386,8 @@ def main():
             port=WEB_SERVER_PORT,
             access_log=None
         )
-    except Exception as e:
-        logger.critical(f"Fatal error in main: {e}\n{traceback.format_exc()}")
+    except Exception:
+        logger.critical("Fatal error in main", exc_info=True)
 
 if __name__ == "__main__":
     logger.info("===== STARTING BOT APPLICATION =====")